@@ -6,39 +6,182 @@ Provides login/logout functionality using streamlit-authenticator
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
-from yaml.loader import SafeLoader
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+import orjson
+from functools import wraps
+import inspect
 import os
+import tempfile
+
+# Derived copy of config.yaml that is much cheaper to parse
+CONFIG_JSON_PATH = 'config.json'
+
+def _yaml_stamp(sr):
+    """Identify one version of config.yaml by its stat result"""
+    return [sr.st_mtime_ns, sr.st_size]
+
+def _write_config_json(config, stamp):
+    """Regenerate the config.json sidecar for the config.yaml version in stamp"""
+    try:
+        data = orjson.dumps({'yaml_stamp': stamp, 'config': config})
+        # Only keep a sidecar that loads back to exactly what the YAML gave,
+        # e.g. not one where a date value would come back as a string
+        if orjson.loads(data)['config'] != config:
+            return
+        _atomic_write(CONFIG_JSON_PATH, data)
+    except (OSError, TypeError):
+        # Read-only app directory, or data orjson cannot encode such as
+        # non-string keys. The sidecar is only an optimisation; go without it.
+        pass
+
+def _read_fd(fd, size):
+    """Read an open file descriptor to EOF, starting with a size-byte read"""
+    chunks = []
+    while True:
+        chunk = os.read(fd, max(size, 1))
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+def _read_file(path, size):
+    """Read a file whose size is already known (or estimated) from a previous stat"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return _read_fd(fd, size)
+    finally:
+        os.close(fd)
+
+def _read_config_json(stamp):
+    """Return the sidecar's config if it was written for this config.yaml version"""
+    try:
+        # The sidecar is about the size of the YAML it was generated from
+        sidecar = orjson.loads(_read_file(CONFIG_JSON_PATH, stamp[1]))
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if not isinstance(sidecar, dict) or sidecar.get('yaml_stamp') != stamp:
+        return None
+    return sidecar.get('config')
+
+@st.cache_resource
+def _load_config_cached(path: str, mtime_ns: int, size: int):
+    """Parse config.yaml once per modification time and reuse it across reruns"""
+    # config.yaml stays the source of truth; the sidecar is only used when it
+    # was written for exactly this version of it, so hand edits take effect
+    stamp = [mtime_ns, size]
+    config = _read_config_json(stamp)
+    if config is not None:
+        return config
+
+    # Hand libyaml one buffer instead of a text stream it reads back through Python
+    config = yaml.load(_read_file(path, size), Loader=SafeLoader)
+    # The authenticator no longer hashes on construction, so hash any plaintext
+    # passwords added to config.yaml by hand here; bcrypt hashes are left as is
+    stauth.Hasher.hash_passwords(config['credentials'])
+    _write_config_json(config, stamp)
+    return config
 
 def load_config():
     """Load authentication configuration from config.yaml"""
     config_path = 'config.yaml'
-    if not os.path.exists(config_path):
+    # A single stat both checks existence and provides the cache key
+    try:
+        sr = os.stat(config_path)
+    except FileNotFoundError:
         st.error("Authentication configuration file not found. Please run generate_passwords.py first.")
         st.stop()
 
-    with open(config_path) as file:
-        config = yaml.load(file, Loader=SafeLoader)
-    return config
+    # mtime is part of the cache key so a save_config() forces a fresh parse
+    return _load_config_cached(config_path, *_yaml_stamp(sr))
+
+def _atomic_write(path, data):
+    """Write bytes to path through a private temp file and an atomic rename
+
+    Returns the stat of the written file, which the rename leaves unchanged.
+    """
+    # A unique temp file per write, so sessions flushing at the same time on
+    # different threads never write into each other's file
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            sr = os.fstat(file.fileno())
+        try:
+            # mkstemp creates the file 0600; keep the permissions of the file it replaces
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return sr
 
 def save_config(config):
-    """Save authentication configuration to config.yaml"""
+    """Queue the configuration to be written by flush_config()"""
+    st.session_state['_config_dirty'] = config
+
+def flush_config():
+    """Write queued configuration changes to config.yaml, at most once per rerun"""
+    config = st.session_state.pop('_config_dirty', None)
+    if config is None:
+        return
+
     config_path = 'config.yaml'
-    with open(config_path, 'w') as file:
-        yaml.dump(config, file, default_flow_style=False)
+    data = yaml.dump(config, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+                     default_flow_style=False, encoding='utf-8')
+    # Atomic swap; the new mtime also invalidates _load_config_cached
+    sr = _atomic_write(config_path, data)
+    # Stamped with the written file's own stat, not a later os.stat() that could
+    # already see another session's config.yaml
+    _write_config_json(config, _yaml_stamp(sr))
 
-def initialize_authenticator():
-    """Initialize the streamlit authenticator"""
-    config = load_config()
+# Skip the cookie-manager wait in login(). 0.3.x takes it as login(sleep_time=),
+# 0.4.x as Authenticate(login_sleep_time=) through its **kwargs
+_LOGIN_KWARGS = {}
+_AUTHENTICATE_KWARGS = {}
+if 'sleep_time' in inspect.signature(stauth.Authenticate.login).parameters:
+    _LOGIN_KWARGS['sleep_time'] = 0
+else:
+    _init_params = inspect.signature(stauth.Authenticate).parameters
+    if ('login_sleep_time' in _init_params
+            or any(p.kind is inspect.Parameter.VAR_KEYWORD for p in _init_params.values())):
+        _AUTHENTICATE_KWARGS['login_sleep_time'] = 0
 
-    authenticator = stauth.Authenticate(
+def _build_authenticator(config):
+    """Construct a streamlit authenticator for the given configuration"""
+    return stauth.Authenticate(
         config['credentials'],
         config['cookie']['name'],
         config['cookie']['key'],
-        config['cookie']['expiry_days']
+        config['cookie']['expiry_days'],
+        # Passwords are hashed when config.yaml is loaded or a password changes,
+        # not on every construction
+        auto_hash=False,
+        **_AUTHENTICATE_KWARGS
     )
 
+def initialize_authenticator():
+    """Initialize the streamlit authenticator"""
+    config = load_config()
+    # Built on every rerun: its cookie manager only reads the browser's cookies
+    # when constructed, so a cached instance would miss the re-login cookie and
+    # would be shared between sessions
+    authenticator = _build_authenticator(config)
+
     return authenticator, config
 
+def _show_logout(authenticator, name):
+    """Show the welcome message and logout button in the sidebar"""
+    with st.sidebar:
+        st.write(f'Welcome *{name}*')
+        authenticator.logout(location='sidebar')
+        st.markdown("---")
+
 def check_authentication():
     """
     Check if user is authenticated and handle login/logout/registration
@@ -47,32 +190,51 @@ def check_authentication():
 
     # Initialize authenticator
     authenticator, config = initialize_authenticator()
+    # Keep them for the account widgets rendered later in this rerun. They are
+    # replaced on every rerun, and building a second authenticator here would
+    # mount a second cookie manager under the same widget key.
+    st.session_state['_authenticator'] = authenticator
+    st.session_state['_config'] = config
 
-    # Create tabs for Login, Register, and Forgot Password
-    tab1, tab2, tab3 = st.tabs(["Login", "Register", "Forgot Password"])
+    # Fast path: already logged in this session, only the logout block is needed
+    if st.session_state.get('authenticated') and st.session_state.get('authentication_status'):
+        _show_logout(authenticator, st.session_state.get('name'))
+        return True
+
+    # Selector for Login, Register, and Forgot Password. Unlike st.tabs, only the
+    # chosen view's widgets run, so the register/forgot forms cost nothing while
+    # the user is on the login form.
+    auth_view = st.radio("Account", ["Login", "Register", "Forgot Password"],
+                         horizontal=True, label_visibility="collapsed",
+                         key="_auth_view")
 
-    with tab1:
+    if auth_view == "Login":
         # Create login widget
         try:
-            authenticator.login()
+            authenticator.login(**_LOGIN_KWARGS)
         except Exception as e:
             st.error(e)
             return False
 
-    with tab2:
+    elif auth_view == "Register":
         # Create registration widget
         try:
-            if authenticator.register_user('Register user', preauthorization=False):
-                st.success('User registered successfully! Please go to the Login tab to sign in.')
+            email_of_registered_user, username_of_registered_user, name_of_registered_user = \
+                authenticator.register_user(location='main', pre_authorization=False,
+                                            fields={'Form name': 'Register user'})
+            if email_of_registered_user:
+                st.success('User registered successfully! Please switch to Login to sign in.')
                 # Save the updated config with new user
+                stauth.Hasher.hash_passwords(config['credentials'])
                 save_config(config)
         except Exception as e:
             st.error(e)
 
-    with tab3:
+    elif auth_view == "Forgot Password":
         # Create forgot password widget
         try:
-            username_forgot_pw, email_forgot_password, random_password = authenticator.forgot_password('Forgot password')
+            username_forgot_pw, email_forgot_password, random_password = authenticator.forgot_password(
+                location='main', fields={'Form name': 'Forgot password'})
             if username_forgot_pw:
                 st.success('New password generated successfully!')
                 st.info(f'Your new password is: **{random_password}**')
@@ -84,25 +246,25 @@ def check_authentication():
         except Exception as e:
             st.error(e)
 
+    # Persist any registration / forgotten-password change in one write
+    flush_config()
+
     # Get authentication status from session state
     name = st.session_state.get('name')
     authentication_status = st.session_state.get('authentication_status')
     username = st.session_state.get('username')
 
     if authentication_status == False:
+        st.session_state['authenticated'] = False
         st.error('Username/password is incorrect')
         return False
     elif authentication_status == None:
+        st.session_state['authenticated'] = False
         st.warning('Please enter your username and password')
         return False
     elif authentication_status:
         # User is authenticated
-
-        # Create logout button in sidebar
-        with st.sidebar:
-            st.write(f'Welcome *{name}*')
-            authenticator.logout(location='sidebar')
-            st.markdown("---")
+        _show_logout(authenticator, name)
 
         # Store user info in session state for use in main app
         st.session_state['user_name'] = name
@@ -121,28 +283,39 @@ def get_current_user():
         'authenticated': st.session_state.get('authenticated', False)
     }
 
+def _get_authenticator():
+    """Return the authenticator built by check_authentication() in this rerun"""
+    authenticator = st.session_state.get('_authenticator')
+    config = st.session_state.get('_config')
+    if authenticator is None or config is None:
+        authenticator, config = initialize_authenticator()
+    return authenticator, config
+
 def show_password_reset():
     """Show password reset widget for authenticated users"""
-    authenticator, config = initialize_authenticator()
+    authenticator, config = _get_authenticator()
     username = st.session_state.get('username')
 
     if username:
         try:
-            if authenticator.reset_password(username, 'Reset password'):
+            if authenticator.reset_password(username, location='main',
+                                            fields={'Form name': 'Reset password'}):
                 st.success('Password modified successfully')
                 # Save the updated config
+                stauth.Hasher.hash_passwords(config['credentials'])
                 save_config(config)
         except Exception as e:
             st.error(e)
 
 def show_update_user_details():
     """Show update user details widget for authenticated users"""
-    authenticator, config = initialize_authenticator()
+    authenticator, config = _get_authenticator()
     username = st.session_state.get('username')
 
     if username:
         try:
-            if authenticator.update_user_details(username, 'Update user details'):
+            if authenticator.update_user_details(username, location='main',
+                                                 fields={'Form name': 'Update user details'}):
                 st.success('User details updated successfully')
                 # Save the updated config
                 save_config(config)
@@ -154,7 +327,10 @@ def require_authentication(func):
     Decorator to require authentication for a function
     Usage: @require_authentication
     """
+    @wraps(func)
     def wrapper(*args, **kwargs):
+        # check_authentication() has its own fast path for logged-in sessions
+        # and also re-renders the sidebar logout button
         if check_authentication():
             return func(*args, **kwargs)
         else:
@@ -4,18 +4,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")   # headless backend; charts are only ever rendered to PNG
 import matplotlib.pyplot as plt
-from datetime import date, timedelta
-from dataclasses import dataclass
-from typing import List, Sequence, Optional
-import io, tempfile
+from datetime import date
+from typing import List, NamedTuple, Sequence, Optional
+import io
 from docx import Document
 from docx.shared import Inches
 from docx.enum.section import WD_ORIENT
 from docx.shared import RGBColor
+from numba import njit
 
 # Import authentication module
-from auth import check_authentication, get_current_user, show_password_reset, show_update_user_details
+from auth import check_authentication, get_current_user, show_password_reset, show_update_user_details, flush_config
 
 # ════════════════════════════════════════════════════════════════
 # 0.  Page configuration & authentication
@@ -43,90 +45,116 @@ st.success(f"Welcome back, {current_user['name']}! 👋")
 # ════════════════════════════════════════════════════════════════
 # 1.  Helper objects & core math                                  
 # ════════════════════════════════════════════════════════════════
-@dataclass
-class Factor:
+class Factor(NamedTuple):
+    # A tuple of Factors is hashable, so it can key the st.cache_data builders
     label: str
     value: float        # decimal (e.g., 0.035 = 3.5 %)
 
+@st.cache_data
 def build_aif(factors: Sequence[Factor]) -> float:
-    a = 1.0
-    for f in factors:
-        if f.label == "Personal Consumption":
-            # Personal consumption uses (a - n) formula
-            a *= (a - f.value)
-        elif f.label == "Fringe Benefits":
-            # Fringe benefits add to earnings: (1 + n) formula
-            a *= (1 + f.value)
-        else:
-            # Other factors reduce earnings: (1 - n) formula
-            a *= (1 - f.value)
-    return round(a, 6)
+    n    = len(factors)
+    vals = np.fromiter((f.value for f in factors), float, n)
+    pc   = np.fromiter((f.label == "Personal Consumption" for f in factors), bool, n)
+    fb   = np.fromiter((f.label == "Fringe Benefits" for f in factors), bool, n)
+    # Fringe benefits add to earnings: (1 + n); other factors reduce them: (1 - n)
+    steps = np.where(fb, 1 + vals, 1 - vals)
+
+    # Personal consumption uses (a - n) formula on the running product, so only
+    # the runs of plain multipliers between those steps can be reduced at once
+    a, lo = 1.0, 0
+    for i in np.flatnonzero(pc):
+        a *= np.prod(steps[lo:i])
+        a *= (a - vals[i])
+        lo = i + 1
+    a *= np.prod(steps[lo:])
+    return round(float(a), 6)
+
+# Integer codes for the AEF breakdown kernel
+AEF_CODES = {"Unemployment": 0, "Tax / Offsets": 1,
+             "Personal Consumption": 2, "Fringe Benefits": 3}
+
+@njit(cache=True)
+def apply_factors(codes, vals, start):
+    """Running AEF after each factor step, starting from the worklife factor"""
+    acc  = start
+    hist = np.empty(len(codes))
+    for i in range(len(codes)):
+        c = codes[i]; v = vals[i]
+        if c == 0 or c == 1:    # (1 - n)
+            acc *= (1 - v)
+        elif c == 2:            # (current - n)
+            acc -= v
+        elif c == 3:            # (1 + n)
+            acc *= (1 + v)
+        hist[i] = acc
+    return hist
+
+def growth_factor(n: int, g: float) -> np.ndarray:
+    """(1+g)**t for t = 0..n-1, as a running product instead of n pow() calls"""
+    if g == 0: return np.ones(n)
+    f = np.full(n, 1.0+g); f[:1] = 1.0
+    return np.cumprod(f, out=f)
 
 def days_in_year(y): return 366 if (y % 4 == 0 and (y % 100 != 0 or y % 400 == 0)) else 365
 
+def days_in_years(yrs: np.ndarray) -> np.ndarray:
+    """Array form of days_in_year, for per-year calculations inside a schedule"""
+    leap = (yrs % 4 == 0) & ((yrs % 100 != 0) | (yrs % 400 == 0))
+    return np.where(leap, 366, 365)
+
 def calculate_date_from_years(birth_date: date, years: float) -> date:
     """Calculate a date by adding years to a birth date"""
     try:
-        # Add the whole years
+        # Add the whole years (DateOffset rolls Feb 29 back to Feb 28),
+        # then the fractional year as days
         whole_years = int(years)
-        fractional_year = years - whole_years
-
-        # Calculate the target year
-        target_year = birth_date.year + whole_years
-
-        # Try to create the date with the same month and day
-        try:
-            base_date = date(target_year, birth_date.month, birth_date.day)
-        except ValueError:
-            # Handle leap year edge case (Feb 29)
-            base_date = date(target_year, birth_date.month, 28)
-
-        # Add the fractional year as days
-        days_to_add = int(fractional_year * 365.25)
-        result_date = base_date + timedelta(days=days_to_add)
-
-        return result_date
-    except:
+        days_to_add = int((years - whole_years) * 365.25)
+        ts = pd.Timestamp(birth_date) + pd.DateOffset(years=whole_years)
+        return (ts + pd.Timedelta(days=days_to_add)).date()
+    except (ValueError, OverflowError):
         # Fallback to birth date if calculation fails
         return birth_date
 
 # ════════════════════════════════════════════════════════════════
 # 2.  Single-period schedule builder                              
 # ════════════════════════════════════════════════════════════════
+@st.cache_data(max_entries=32)
 def schedule_block(
     dob: date, start: date, end_year: int,
     pre_base: float, pre_g: float,
     off_base: float, off_g: float,
-    factors: Sequence[Factor],
+    aif: float,
     disc: float, pv_on: bool,
 ) -> pd.DataFrame:
 
     yrs = np.arange(start.year, end_year + 1)
     t   = np.arange(len(yrs))
 
-    first_frac = (days_in_year(start.year) -
-                 (start.timetuple().tm_yday - 1)) / days_in_year(start.year)
+    dpy = days_in_years(yrs)
+    first_frac = (dpy[0] - (start.timetuple().tm_yday - 1)) / dpy[0]
     portion = np.ones_like(t, float); portion[0] = first_frac
 
-    ages = [round((date(y,7,1) - dob).days/365.25, 2) for y in yrs]
-    pre  = pre_base  * (1+pre_g)**t
-    off  = off_base  * (1+off_g)**t
+    # Age at mid-year (July 1) of each calendar year, as one array operation
+    mid_year = ((yrs - 1970)*12 + 6).astype("datetime64[M]").astype("datetime64[D]")
+    ages = np.round((mid_year - np.datetime64(dob, "D")).astype(np.int64)/365.25, 2)
+    pre  = pre_base  * growth_factor(len(yrs), pre_g)
+    off  = off_base  * growth_factor(len(yrs), off_g)
     nom  = (pre - off)*portion
-    aif  = build_aif(factors) if factors else 1.0
     adj  = nom*aif
-    pv   = adj/((1+disc)**t) if pv_on else np.nan
 
+    # Money and portion columns keep full precision; rounding happens only
+    # when they are displayed (see display_format)
     df = pd.DataFrame({
         "Calendar Year": yrs,
-        "Portion of Year (%)": (portion*100).round(2),
+        "Portion of Year (%)": portion*100,
         "Age (yrs)": ages,
-        "Pre-Injury Earnings ($)": pre.round(2),
-        "Mitigating/Offset Earnings ($)": (off*portion).round(2),
-        "Nominal Loss ($)": nom.round(2),
+        "Pre-Injury Earnings ($)": pre,
+        "Mitigating/Offset Earnings ($)": off*portion,
+        "Nominal Loss ($)": nom,
         "AIF (%)": round(aif*100,2),
-        "AIF-Adjusted Loss ($)": adj.round(2),
+        "AIF-Adjusted Loss ($)": adj,
     })
-    if pv_on: df["PV Loss ($)"] = pv.round(2)
+    if pv_on: df["PV Loss ($)"] = adj/growth_factor(len(yrs), disc)
     return df
 
 # ════════════════════════════════════════════════════════════════
@@ -148,6 +176,9 @@ with st.sidebar:
             st.markdown("**Update Your Information**")
             show_update_user_details()
 
+        # Write account changes from either tab in a single save
+        flush_config()
+
     st.markdown("---")
     st.header("🗓 Key Dates")
     dob = st.date_input("Date of birth", date(1980,1,1),
@@ -264,50 +295,59 @@ complete_factors = factors.copy()
 # Add work life factor as a reduction factor (1 - worklife_factor)
 complete_factors.append(Factor("WorkLife Adjustment", 1 - worklife_factor))
 
-# Calculate AEF and create detailed breakdown
-base_aif = build_aif(factors)
-aef_value = base_aif * worklife_factor
+# Calculate AEF once; it is also the AIF applied to both loss schedules
+aef_value = build_aif(tuple(complete_factors))
+
+# Base, worklife, up to four factors, a spacer and the final row
+AEF_MAX_ROWS = 8
+
+def build_aef_df(factors: Sequence[Factor], worklife_factor: float,
+                 aef_value: float) -> pd.DataFrame:
+    # Create the AEF breakdown table with formulas
+    aef_data = np.empty((AEF_MAX_ROWS, 4), dtype=object); n = 0
+
+    # Gross Earnings Base
+    aef_data[n] = ("Gross Earnings Base", "100.00%", "1.00", "Base = 1.0"); n += 1
+
+    # WorkLife Factor - the calculated value from session state
+    aef_data[n] = ("WorkLife Factor", f"{worklife_factor*100:.2f}%", f"{worklife_factor:.2f}", f"WLE/YFS = {worklife_factor:.4f}"); n += 1
+
+    # Apply each factor with formulas; hist[i] is the running factor after step i
+    codes = np.array([AEF_CODES.get(f.label, -1) for f in factors], dtype=np.int64)
+    hist  = apply_factors(codes, np.array([f.value for f in factors], dtype=np.float64),
+                          float(worklife_factor))
+    for i, factor in enumerate(factors):
+        if factor.label == "Unemployment":
+            aef_data[n] = (f"Unemployment Factor", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 - {factor.value:.3f}) = {1-factor.value:.3f}"); n += 1
+        elif factor.label == "Tax / Offsets":
+            aef_data[n] = (f"Tax Liability", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 - {factor.value:.3f}) = {1-factor.value:.3f}"); n += 1
+        elif factor.label == "Personal Consumption":
+            if factor.value > 0:
+                # Personal consumption reduces from current accumulated factor
+                current_factor = hist[i-1] if i else worklife_factor
+                aef_data[n] = (f"Personal Consumption", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"({current_factor:.3f} - {factor.value:.3f}) = {hist[i]:.3f}"); n += 1
+        elif factor.label == "Fringe Benefits":
+            aef_data[n] = (f"Fringe Benefits", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 + {factor.value:.3f}) = {1+factor.value:.3f}"); n += 1
+
+    # Final AEF
+    aef_data[n] = ("", "", "", ""); n += 1
+    aef_data[n] = (f"Final AEF", f"{aef_value*100:.2f}%", f"{aef_value:.2f}", f"Total Calculation Result"); n += 1
+
+    # DataFrame with formula column
+    return pd.DataFrame(aef_data[:n], columns=["Factor", "Percentage", "Decimal", "Formula"])
 
 # Create Adjusted Earnings Factor table
 st.markdown("---")
 st.subheader("📊 Adjusted Earnings Factor (AEF)")
 
-# Create the AEF breakdown table with formulas
-aef_data = []
-current_factor = 1.0
-
-# Gross Earnings Base
-aef_data.append(["Gross Earnings Base", "100.00%", "1.00", "Base = 1.0"])
-
-# WorkLife Factor - use the calculated value from session state
-worklife_factor = st.session_state.get('work_life_factor', 0.91)
-current_factor *= worklife_factor
-aef_data.append(["WorkLife Factor", f"{worklife_factor*100:.2f}%", f"{worklife_factor:.2f}", f"WLE/YFS = {worklife_factor:.4f}"])
-
-# Apply each factor with formulas
-for factor in factors:
-    if factor.label == "Unemployment":
-        current_factor *= (1 - factor.value)
-        aef_data.append([f"Unemployment Factor", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 - {factor.value:.3f}) = {1-factor.value:.3f}"])
-    elif factor.label == "Tax / Offsets":
-        current_factor *= (1 - factor.value)
-        aef_data.append([f"Tax Liability", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 - {factor.value:.3f}) = {1-factor.value:.3f}"])
-    elif factor.label == "Personal Consumption":
-        if factor.value > 0:
-            # Personal consumption reduces from current accumulated factor
-            reduction = current_factor - factor.value
-            aef_data.append([f"Personal Consumption", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"({current_factor:.3f} - {factor.value:.3f}) = {reduction:.3f}"])
-            current_factor = reduction
-    elif factor.label == "Fringe Benefits":
-        current_factor *= (1 + factor.value)
-        aef_data.append([f"Fringe Benefits", f"{factor.value*100:.2f}%", f"{factor.value:.2f}", f"(1 + {factor.value:.3f}) = {1+factor.value:.3f}"])
-
-# Final AEF
-aef_data.append(["", "", "", ""])
-aef_data.append([f"Final AEF", f"{aef_value*100:.2f}%", f"{aef_value:.2f}", f"Total Calculation Result"])
+# Rebuild the breakdown only when its inputs changed since the last rerun
+aef_key = (tuple(factors), worklife_factor)
+if st.session_state.get('_aef_key') != aef_key:
+    st.session_state._aef_df  = build_aef_df(factors, worklife_factor, aef_value)
+    st.session_state._aef_key = aef_key
+aef_df = st.session_state._aef_df
 
 # Display as DataFrame with formula column
-aef_df = pd.DataFrame(aef_data, columns=["Factor", "Percentage", "Decimal", "Formula"])
 st.dataframe(aef_df, use_container_width=True, hide_index=True)
 
 # Add explanation
@@ -328,63 +368,81 @@ df_past = schedule_block(
     dob, doi, dor.year,
     pre_base, pre_g,
     off_past_base, off_past_g,
-    complete_factors, disc, pv_on,
+    aef_value, disc, pv_on,
 )
 # fraction past vs future in report year
 past_days = (dor - date(dor.year,1,1)).days+1
 fut_days  = days_in_year(dor.year) - past_days
 past_frac, fut_frac = past_days/days_in_year(dor.year), fut_days/days_in_year(dor.year)
-# Scale last row of past table
-df_past.loc[df_past.index[-1], "Portion of Year (%)"] *= past_frac
-for c in df_past.columns[3:]:   # money cols
-    df_past.loc[df_past.index[-1], c] *= past_frac
+# Scale last row of past table (col 1 = portion, 3+ = money cols)
+df_past.iloc[-1, 1]  *= past_frac
+df_past.iloc[-1, 3:] *= past_frac
 
 df_future = schedule_block(
     dob, date(dor.year,1,1), ret_year,
     pre_base*(1+pre_g)**(dor.year-doi.year), pre_g,
     off_fut_base, off_fut_g,
-    complete_factors, disc, pv_on,
+    aef_value, disc, pv_on,
 )
-df_future.loc[df_future.index[0], "Portion of Year (%)"] *= fut_frac
-for c in df_future.columns[3:]:
-    df_future.loc[df_future.index[0], c] *= fut_frac
+df_future.iloc[0, 1]  *= fut_frac
+df_future.iloc[0, 3:] *= fut_frac
 
 # ════════════════════════════════════════════════════════════════
 # 5.  Display results                                             
 # ════════════════════════════════════════════════════════════════
+def display_format(df):
+    """Styler that shows money as $1,234.56 and percentages as 12.34%"""
+    fmt = {c: "${:,.2f}" for c in df.columns if c.endswith("($)")}
+    fmt.update({c: "{:.2f}%" for c in df.columns if c.endswith("(%)")})
+    # Styler would otherwise show the remaining floats with 6 decimals
+    if "Age (yrs)" in df: fmt["Age (yrs)"] = "{:.2f}"
+    return df.style.format(fmt)
+
 st.markdown("---")
 st.subheader("Past Losses  (DOI → DOR)")
 st.caption("No mitigation shown if Past offset base is set to 0.")
-st.dataframe(df_past, use_container_width=True)
+st.dataframe(display_format(df_past), use_container_width=True)
 
 st.subheader("Future Losses  (DOR → Retirement)")
 st.caption("Offset column reflects claimant’s post-injury earnings path.")
-st.dataframe(df_future, use_container_width=True)
+st.dataframe(display_format(df_future), use_container_width=True)
 
 # Totals summary
 tot_cols = [c for c in df_past.columns if c.endswith("($)")]
-summary_df = pd.DataFrame({
-    "Past":   df_past[tot_cols].sum(),
-    "Future": df_future[tot_cols].sum(),
-}).T
+past_sums = df_past[tot_cols].to_numpy().sum(axis=0)
+fut_sums  = df_future[tot_cols].to_numpy().sum(axis=0)
+summary_df = pd.DataFrame([past_sums, fut_sums],
+                          index=["Past", "Future"], columns=tot_cols)
 st.subheader("Quick Totals")
-st.dataframe(summary_df, use_container_width=True)
+st.dataframe(display_format(summary_df), use_container_width=True)
 
 # ════════════════════════════════════════════════════════════════
 # 6.  Downloads                                                   
 # ════════════════════════════════════════════════════════════════
-csv_past   = df_past.to_csv(index=False).encode()
-csv_future = df_future.to_csv(index=False).encode()
-excel_io   = io.BytesIO()
-with pd.ExcelWriter(excel_io, engine="openpyxl") as writer:
-    df_past.to_excel(writer, sheet_name="Past", index=False)
-    df_future.to_excel(writer, sheet_name="Future", index=False)
-excel_io.seek(0)
+# Download payloads are cached on the table contents (st.cache_data hashes
+# DataFrames by value), so reruns that leave the tables alone skip the encode
+@st.cache_data(max_entries=8)
+def csv_report(df):
+    return df.to_csv(index=False).encode()
+
+@st.cache_data(max_entries=8)
+def excel_report(past_df, fut_df):
+    excel_io = io.BytesIO()
+    # xlsxwriter only serializes; constant_memory is left off because
+    # DataFrame.to_excel emits cells column by column, not row by row
+    with pd.ExcelWriter(excel_io, engine="xlsxwriter") as writer:
+        past_df.to_excel(writer, sheet_name="Past", index=False)
+        fut_df.to_excel(writer, sheet_name="Future", index=False)
+    return excel_io.getvalue()
+
+csv_past   = csv_report(df_past)
+csv_future = csv_report(df_future)
+excel_bytes = excel_report(df_past, df_future)
 
 colc1, colc2, colc3 = st.columns(3)
 colc1.download_button("⬇️ Past CSV", csv_past, "past_losses.csv")
 colc2.download_button("⬇️ Future CSV", csv_future, "future_losses.csv")
-colc3.download_button("⬇️ Excel (both)", excel_io,
+colc3.download_button("⬇️ Excel (both)", excel_bytes,
                       "lost_earnings_split.xlsx",
                       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
@@ -394,6 +452,19 @@ colc3.download_button("⬇️ Excel (both)", excel_io,
 st.markdown("---")
 st.subheader("Charts")
 
+@st.cache_data(max_entries=16)
+def chart_png(df, title, dpi=150, kind="line", stacked=False, xlabel=None, ylabel=None):
+    """Render a DataFrame plot to PNG bytes, cached on the plotted data"""
+    fig, ax = plt.subplots()
+    df.plot(kind=kind, stacked=stacked, ax=ax)
+    if xlabel: ax.set_xlabel(xlabel)
+    if ylabel: ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout(); buf = io.BytesIO(); fig.savefig(buf, format="png", dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue()
+
+# Each chart is encoded once; the same PNG bytes feed st.image and the Word report
 # Earnings paths line chart
 chart_df = df_future.set_index("Calendar Year")[[
     "Pre-Injury Earnings ($)",
@@ -402,40 +473,31 @@ chart_df = df_future.set_index("Calendar Year")[[
 ]]
 if pv_on:
     chart_df["PV Loss ($)"] = df_future["PV Loss ($)"]
-fig1, ax1 = plt.subplots()
-chart_df.plot(ax=ax1)
-ax1.set_ylabel("Dollars")
-ax1.set_title("Earnings Paths & Losses (Future period)")
-fig1.tight_layout(); buf1 = io.BytesIO(); fig1.savefig(buf1, format="png", dpi=200)
-st.pyplot(fig1)
+png1 = chart_png(chart_df, "Earnings Paths & Losses (Future period)", ylabel="Dollars")
+st.image(png1, use_container_width=True)
 
 # Past vs Future bar
-fig2, ax2 = plt.subplots()
-summary_df.plot(kind="barh", ax=ax2)
-ax2.set_xlabel("Total Dollars")
-ax2.set_title("Past vs Future – Cumulative Values")
-fig2.tight_layout(); buf2 = io.BytesIO(); fig2.savefig(buf2, format="png", dpi=200)
-st.pyplot(fig2)
+png2 = chart_png(summary_df, "Past vs Future – Cumulative Values",
+                 kind="barh", xlabel="Total Dollars")
+st.image(png2, use_container_width=True)
 
 # Tinari stacked bar (future)
-buf3 = None
+png3 = None
 if "AIF-Adjusted Loss ($)" in df_future:
     bar_df = pd.DataFrame({
         "Calendar Year": df_future["Calendar Year"],
         "Nominal Loss": df_future["Nominal Loss ($)"],
         "AIF Deductions": df_future["Nominal Loss ($)"] - df_future["AIF-Adjusted Loss ($)"],
     }).set_index("Calendar Year")
-    fig3, ax3 = plt.subplots()
-    bar_df.plot(kind="bar", stacked=True, ax=ax3)
-    ax3.set_ylabel("Dollars")
-    ax3.set_title("Tinari Adjustments (Future)")
-    fig3.tight_layout(); buf3 = io.BytesIO(); fig3.savefig(buf3, format="png", dpi=200)
-    st.pyplot(fig3)
+    png3 = chart_png(bar_df, "Tinari Adjustments (Future)",
+                     kind="bar", stacked=True, ylabel="Dollars")
+    st.image(png3, use_container_width=True)
 
 # ════════════════════════════════════════════════════════════════
 # 8.  Word report                                                 
 # ════════════════════════════════════════════════════════════════
-def word_report(past_df, fut_df, charts, aef_df):
+@st.cache_data(max_entries=8)
+def word_report(past_df, fut_df, charts, aef_df, info_data):
     doc = Document()
 
     # Set document to landscape orientation
@@ -446,38 +508,23 @@ def word_report(past_df, fut_df, charts, aef_df):
     section.page_width = new_width
     section.page_height = new_height
 
-    # Add main heading and ensure black text
-    main_heading = doc.add_heading("Lost-Earnings Analysis", 0)
-    for run in main_heading.runs:
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    # Black text throughout, set once on the styles instead of on every run
+    for style in ("Normal", "Title", "Heading 1", "Heading 2", "Table Grid"):
+        doc.styles[style].font.color.rgb = RGBColor(0, 0, 0)
+
+    # Add main heading
+    doc.add_heading("Lost-Earnings Analysis", 0)
 
     # Add key information section
-    key_heading = doc.add_heading("Key Dates and Parameters", level=1)
-    for run in key_heading.runs:
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    doc.add_heading("Key Dates and Parameters", level=1)
     info_table = doc.add_table(rows=8, cols=2)
     info_table.style = "Table Grid"  # Changed from "Light Shading Accent 1" to black and white
 
     # Add key dates and parameters
-    info_data = [
-        ["Date of Birth", dob.strftime('%m/%d/%Y')],
-        ["Date of Injury", doi.strftime('%m/%d/%Y')],
-        ["Date of Report", dor.strftime('%m/%d/%Y')],
-        ["Life Expectancy (LE)", f"{le:.2f} years"],
-        ["Worklife Expectancy (WLE)", f"{wle:.2f} years"],
-        ["Statistical Death Date", statistical_death_date.strftime('%m/%d/%Y')],
-        ["Statistical Retirement Date", statistical_retirement_date.strftime('%m/%d/%Y')],
-        ["Final AEF", f"{aef_value:.2f}"]
-    ]
-
     for i, (label, value) in enumerate(info_data):
         # Set label cell
         label_cell = info_table.cell(i, 0)
         label_cell.text = label
-        # Ensure black text
-        for paragraph in label_cell.paragraphs:
-            for run in paragraph.runs:
-                run.font.color.rgb = RGBColor(0, 0, 0)
 
         # Set value cell with proper formatting
         value_cell = info_table.cell(i, 1)
@@ -491,128 +538,134 @@ def word_report(past_df, fut_df, charts, aef_df):
                 value_cell.text = f"{value:.2f}"
         else:
             value_cell.text = str(value).replace("**", "")  # Remove any asterisks
-        # Ensure black text
-        for paragraph in value_cell.paragraphs:
-            for run in paragraph.runs:
-                run.font.color.rgb = RGBColor(0, 0, 0)
 
     # Add AEF table
     doc.add_page_break()
-    aef_heading = doc.add_heading("Adjusted Earnings Factor (AEF)", level=1)
-    for run in aef_heading.runs:
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    doc.add_heading("Adjusted Earnings Factor (AEF)", level=1)
     _tbl(doc, aef_df)
 
     # Add loss tables
     doc.add_page_break()
-    past_heading = doc.add_heading("Past Losses (DOI → DOR)", level=1)
-    for run in past_heading.runs:
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    doc.add_heading("Past Losses (DOI → DOR)", level=1)
     _tbl(doc, past_df)
 
     doc.add_page_break()
-    future_heading = doc.add_heading("Future Losses (DOR → Retirement)", level=1)
-    for run in future_heading.runs:
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    doc.add_heading("Future Losses (DOR → Retirement)", level=1)
     _tbl(doc, fut_df)
 
     # Add charts
     titles = ["Earnings Paths (Future)", "Past vs Future Summary", "Tinari Adjustments"]
-    for buf, title in zip(charts, titles):
-        if buf:
-            buf.seek(0)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            tmp.write(buf.read())
-            tmp.close()
+    for png, title in zip(charts, titles):
+        if png:
             doc.add_page_break()
-            chart_heading = doc.add_heading(title, level=2)
-            for run in chart_heading.runs:
-                run.font.color.rgb = RGBColor(0, 0, 0)
-            doc.add_picture(tmp.name, width=Inches(6))
+            doc.add_heading(title, level=2)
+            doc.add_picture(io.BytesIO(png), width=Inches(6))
 
     out = io.BytesIO()
     doc.save(out)
     out.seek(0)
     return out.read()
 
+def _fmt_cell(cell_value, column_name):
+    """Word-table text for a single value of a mixed-type (object) column"""
+    # Format numeric values based on column type
+    if isinstance(cell_value, (int, float)) and not pd.isna(cell_value):
+        # Check if this is a percentage column
+        if "%" in column_name:
+            # For percentage columns, format as XX.XX%
+            if "Portion of Year" in column_name or "AIF" in column_name:
+                # These are already multiplied by 100
+                cell_text = f"{cell_value:.2f}%"
+            else:
+                # These need to be multiplied by 100 (like decimal values in AEF table)
+                cell_text = f"{cell_value * 100:.2f}%" if cell_value <= 1 else f"{cell_value:.2f}%"
+        elif abs(cell_value) >= 1000:
+            cell_text = f"{cell_value:,.2f}"
+        else:
+            cell_text = f"{cell_value:.2f}"
+    else:
+        # Handle string values (like pre-formatted percentages in AEF table)
+        cell_text = str(cell_value)
+        # If it's in the Percentage column but already a string with %, ensure proper formatting
+        if "Percentage" in column_name and "%" in cell_text:
+            # Extract the numeric part and reformat to ensure 2 decimal places
+            try:
+                numeric_part = float(cell_text.replace("%", ""))
+                cell_text = f"{numeric_part:.2f}%"
+            except ValueError:
+                # If conversion fails, keep original string
+                pass
+
+    # Remove asterisks from text
+    return cell_text.replace("**", "")
+
+def _fmt_column(col: pd.Series) -> List[str]:
+    """Word-table text for a whole column, choosing the format once per column"""
+    name = col.name
+    if col.dtype.kind == "f":
+        v = col.to_numpy()
+        if "%" in name and ("Portion of Year" in name or "AIF" in name):
+            out = [f"{x:.2f}%" for x in v]
+        elif "%" in name:
+            out = [f"{x * 100:.2f}%" if x <= 1 else f"{x:.2f}%" for x in v]
+        else:
+            out = [f"{x:,.2f}" if abs(x) >= 1000 else f"{x:.2f}" for x in v]
+        # NaN is left as str(nan), as for any other non-numeric value
+        return [t if x == x else str(x) for t, x in zip(out, v)]
+    if col.dtype.kind in "iub":
+        # NumPy integers/bools are not Python ints, so they print as-is
+        return col.astype(str).tolist()
+    return [_fmt_cell(x, name) for x in col]
+
 def _tbl(doc, df):
     r, c = df.shape
     t = doc.add_table(r+1, c)
     t.style = "Table Grid"  # Changed from "Light Shading Accent 1" to black and white
 
-    # Set column widths based on content type
-    for i, col in enumerate(t.columns):
-        for cell in col.cells:
-            if i == 0:  # Factor name column
-                cell.width = Inches(2.5)
-            elif i == 3 and c > 3:  # Formula column if it exists
-                cell.width = Inches(3.0)
-            else:
-                cell.width = Inches(1.2)
+    # Column widths based on content type
+    widths = [Inches(2.5) if j == 0              # Factor name column
+              else Inches(3.0) if j == 3 and c > 3  # Formula column if it exists
+              else Inches(1.2)
+              for j in range(c)]
+
+    # Format every value up front, one column at a time
+    columns = [_fmt_column(df.iloc[:, j]) for j in range(c)]
+
+    # Fetch each row's cells once; t.cell(i, j) re-walks the table XML per call.
+    # Setting cell.text leaves exactly one paragraph with one run.
+    rows = t.rows
 
     # Add headers
+    cells = rows[0].cells
     for j, col in enumerate(df.columns):
-        cell = t.cell(0, j)
-        cell.text = str(col)
-        # Make header bold and black
-        for paragraph in cell.paragraphs:
-            for run in paragraph.runs:
-                run.bold = True
-                run.font.color.rgb = RGBColor(0, 0, 0)  # Ensure black text
+        cells[j].width = widths[j]
+        cells[j].text = str(col)
+        # Make header bold
+        cells[j].paragraphs[0].runs[0].bold = True
 
     # Add data
     for i in range(r):
+        cells = rows[i+1].cells
         for j in range(c):
-            cell_value = df.iat[i, j]
-            column_name = df.columns[j]
-
-            # Format numeric values based on column type
-            if isinstance(cell_value, (int, float)) and not pd.isna(cell_value):
-                # Check if this is a percentage column
-                if "%" in column_name:
-                    # For percentage columns, format as XX.XX%
-                    if "Portion of Year" in column_name or "AIF" in column_name:
-                        # These are already multiplied by 100
-                        cell_text = f"{cell_value:.2f}%"
-                    else:
-                        # These need to be multiplied by 100 (like decimal values in AEF table)
-                        cell_text = f"{cell_value * 100:.2f}%" if cell_value <= 1 else f"{cell_value:.2f}%"
-                elif abs(cell_value) >= 1000:
-                    cell_text = f"{cell_value:,.2f}"
-                else:
-                    cell_text = f"{cell_value:.2f}"
-            else:
-                # Handle string values (like pre-formatted percentages in AEF table)
-                cell_text = str(cell_value)
-                # If it's in the Percentage column but already a string with %, ensure proper formatting
-                if "Percentage" in column_name and "%" in cell_text:
-                    # Extract the numeric part and reformat to ensure 2 decimal places
-                    try:
-                        numeric_part = float(cell_text.replace("%", ""))
-                        cell_text = f"{numeric_part:.2f}%"
-                    except ValueError:
-                        # If conversion fails, keep original string
-                        pass
-
-            # Remove asterisks from text
-            cell_text = cell_text.replace("**", "")
-
-            cell = t.cell(i+1, j)
-            cell.text = cell_text
-
-            # Make final AEF row bold and black
+            cell_text = columns[j][i]
+            cells[j].width = widths[j]
+            cells[j].text = cell_text
+            # Make final AEF row bold
             if "Final AEF" in cell_text:
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.color.rgb = RGBColor(0, 0, 0)  # Ensure black text
-            else:
-                # Ensure all other text is black
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.font.color.rgb = RGBColor(0, 0, 0)
-
-doc_bytes = word_report(df_past, df_future, (buf1, buf2, buf3), aef_df)
+                cells[j].paragraphs[0].runs[0].bold = True
+
+# Report parameters are passed in explicitly so they are part of the cache key
+info_data = (
+    ("Date of Birth", dob.strftime('%m/%d/%Y')),
+    ("Date of Injury", doi.strftime('%m/%d/%Y')),
+    ("Date of Report", dor.strftime('%m/%d/%Y')),
+    ("Life Expectancy (LE)", f"{le:.2f} years"),
+    ("Worklife Expectancy (WLE)", f"{wle:.2f} years"),
+    ("Statistical Death Date", statistical_death_date.strftime('%m/%d/%Y')),
+    ("Statistical Retirement Date", statistical_retirement_date.strftime('%m/%d/%Y')),
+    ("Final AEF", f"{aef_value:.2f}"),
+)
+doc_bytes = word_report(df_past, df_future, (png1, png2, png3), aef_df, info_data)
 st.download_button("⬇️ Word Report",
     doc_bytes, "lost_earnings_report.docx",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
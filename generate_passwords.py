@@ -4,12 +4,22 @@ Script to generate hashed passwords for the authentication config.
 Run this script to generate proper bcrypt hashes for your passwords.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 import yaml
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# bcrypt cost factor; override with BCRYPT_ROUNDS=... if your threat model allows
+ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
 
 def hash_password(password: str) -> str:
     """Generate a bcrypt hash for a password."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=ROUNDS)).decode('utf-8')
 
 def update_config_with_hashed_passwords():
     """Update the config.yaml file with properly hashed passwords."""
@@ -24,19 +34,24 @@ def update_config_with_hashed_passwords():
     print("Generating password hashes...")
     
     # Load existing config
-    with open('config.yaml', 'r') as file:
-        config = yaml.safe_load(file)
+    with open('config.yaml', 'rb') as file:
+        config = yaml.load(file, Loader=SafeLoader)
     
+    # Hash in parallel; bcrypt releases the GIL while it works
+    users = {username: password for username, password in passwords.items()
+             if username in config['credentials']['usernames']}
+    with ThreadPoolExecutor() as executor:
+        hashed = dict(zip(users, executor.map(hash_password, users.values())))
+
     # Update passwords with proper hashes
-    for username, password in passwords.items():
-        if username in config['credentials']['usernames']:
-            hashed = hash_password(password)
-            config['credentials']['usernames'][username]['password'] = hashed
-            print(f"Updated password for {username}")
+    for username, password_hash in hashed.items():
+        config['credentials']['usernames'][username]['password'] = password_hash
+        print(f"Updated password for {username}")
     
     # Write back to file
-    with open('config.yaml', 'w') as file:
-        yaml.dump(config, file, default_flow_style=False)
+    with open('config.yaml', 'wb') as file:
+        yaml.dump(config, file, Dumper=SafeDumper, default_flow_style=False,
+                  encoding='utf-8')
     
     print("\nConfig file updated with hashed passwords!")
     print("Default login credentials:")